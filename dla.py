@@ -10,107 +10,583 @@ Email:  heikki.lappalainen@protonmail.com
 import sys
 import argparse
 import time
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
 import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
+from numba import njit, prange, get_num_threads
 from tqdm import tqdm
 
 
+# Possible moves for random walkers: up, down, left, right
+DY = np.array([-1, 1, 0, 0], dtype=np.int8)
+DX = np.array([0, 0, -1, 1], dtype=np.int8)
+# Range of the pre-drawn move numbers. It is divisible by 1, 2, 3 and 4, so
+# the number modulo the count of free neighboring sites picks one uniformly.
+N_MOVES = 12
+# Number of random numbers drawn at a time for the walk kernel
+BUFFER_SIZE = 65536
+# Number of random numbers drawn at a time for a walker of the pool workers
+WORKER_STEPS = 2048
+# Largest number of walkers moved at a time by the NumPy main loop
+BATCH_SIZE = 512
+# Live walkers per lattice site in the NumPy main loop. A denser walker
+# population grows a compact aggregate instead of DLA.
+WALKER_DENSITY = 0.005
+# Number of steps each walker of the parallel main loop takes at a time
+BATCH_STEPS = 256
+# Side length of the coarse occupancy blocks
+BLOCK = 8
+# Jump radius for walkers far from the aggregate. A walker in a block whose
+# 3x3 block neighborhood is empty has no sticky site within this distance.
+JUMP = BLOCK - 1
+# Distance between the aggregate and the launch circle of central DLA
+LAUNCH_GAP = 5
+# Walkers farther than this many launch radii from the seed are respawned
+KILL_FACTOR = 3
+# Main loop implementations
+METHODS = ["serial", "pool", "numpy", "numba"]
+# Largest relative deviation from the serial radius of gyration accepted by
+# compare
+RG_TOLERANCE = 0.15
+
+
+@njit(cache=True)
+def blocks_free(blocks: np.array, by: int, bx: int) -> bool:
+    """
+    Check if the given block and its eight neighboring blocks are empty.
+
+    Params:
+      blocks (np.array):  Boolean mask of the occupied blocks.
+      by, bx (int):       The block coordinates.
+    Returns:
+      (boolean):          True if no site in the blocks is occupied.
+    """
+    nb = blocks.shape[0]
+    for i in range(max(by-1, 0), min(by+2, nb)):
+        for j in range(max(bx-1, 0), min(bx+2, nb)):
+            if blocks[i, j]:
+                return False
+    return True
+
+
+def progress(n_walkers: int, **kwargs) -> tqdm:
+    """
+    Create a progress bar for the main loops that refreshes at most every
+    hundredth walker and every half a second.
+
+    Params:
+      n_walkers (int):  Number of random walkers.
+      kwargs:           Passed on to tqdm.
+    Returns:
+      (tqdm):           The progress bar.
+    """
+    return tqdm(miniters=max(1, n_walkers // 100), mininterval=0.5, **kwargs)
+
+
+def radius_of_gyration(sites: np.array) -> float:
+    """
+    Compute the radius of gyration of the occupied sites.
+
+    Params:
+      sites (np.array):  The occupied sites, nonzero where occupied.
+    Returns:
+      (float):           Root mean square distance of the occupied sites from
+                         their center of mass, 0 if there are none.
+    """
+    ys, xs = np.nonzero(sites)
+    if ys.size == 0:
+        return 0.0
+    return float(np.sqrt(np.mean((ys - ys.mean())**2 + (xs - xs.mean())**2)))
+
+
+@njit(cache=True)
+def walk(lattice: np.array, neighbors: np.array, blocks: np.array, L: int,
+         p: float, r_spawn: float, r_kill: float, y: int, x: int,
+         dirs: np.array, sticks: np.array, k: int) -> tuple:
+    """
+    Perform a random walk from (y, x) until the walker sticks or the random
+    number buffers run out. On a sticky site the walker sticks with
+    probability p, otherwise it moves into one of the free neighboring sites,
+    or stays in place if there are none.
+    Far from the aggregate the walker jumps to a random point on a circle of
+    radius JUMP instead, which is where a Brownian walk would first leave the
+    circle. A walker farther than r_kill from the lattice center is moved
+    back to a random point on the launch circle of radius r_spawn.
+
+    Params:
+      lattice (np.array):    The simulation lattice.
+      neighbors (np.array):  Boolean mask of the sticky sites.
+      blocks (np.array):     Boolean mask of the occupied BLOCKxBLOCK blocks.
+      L (int):               Lattice side length.
+      p (float):             Sticky factor in [0..1].
+      r_spawn (float):       Launch circle radius.
+      r_kill (float):        Kill circle radius, inf to never respawn.
+      y, x (int):            The starting position.
+      dirs (np.array):       Pre-drawn move numbers in [0..N_MOVES-1].
+      sticks (np.array):     Pre-drawn uniform numbers for the sticky factor.
+      k (int):               Index of the next unused random number.
+    Returns:
+      (tuple):               The walker position, the next unused index and
+                             True if the walker stuck.
+    """
+    n = dirs.shape[0]
+    c = L // 2
+    while k < n:
+        if neighbors[y, x] and sticks[k] < p:
+            return y, x, k+1, True
+        if (y-c)**2 + (x-c)**2 > r_kill**2:
+            angle = 2*np.pi*sticks[k]
+            y = c + int(np.rint(r_spawn*np.sin(angle)))
+            x = c + int(np.rint(r_spawn*np.cos(angle)))
+            k += 1
+            continue
+        if (y >= JUMP and x >= JUMP and y < L-JUMP and x < L-JUMP
+                and blocks_free(blocks, y // BLOCK, x // BLOCK)):
+            angle = 2*np.pi*sticks[k]
+            y += int(np.rint(JUMP*np.sin(angle)))
+            x += int(np.rint(JUMP*np.cos(angle)))
+            k += 1
+            continue
+        up = int(y > 0 and lattice[y-1, x] == 0)
+        down = int(y < L-1 and lattice[y+1, x] == 0)
+        left = int(x > 0 and lattice[y, x-1] == 0)
+        right = int(x < L-1 and lattice[y, x+1] == 0)
+        n_free = up + down + left + right
+        if n_free > 0:
+            r = dirs[k] % n_free  # Index among the free sites
+            if up and r == 0:
+                y -= 1
+            elif down and r == up:
+                y += 1
+            elif left and r == up + down:
+                x -= 1
+            else:
+                x += 1
+        k += 1
+    return y, x, k, False
+
+
+@njit(cache=True, parallel=True)
+def walk_batch(lattice: np.array, neighbors: np.array, blocks: np.array,
+               L: int, p: float, r_spawn: float, r_kill: float, ys: np.array,
+               xs: np.array, dirs: np.array, sticks: np.array,
+               stuck: np.array) -> None:
+    """
+    Walk a batch of walkers in parallel threads. Each walker walks until it
+    sticks or its row of random numbers runs out. The lattice is only read,
+    so the walkers see the same snapshot of it.
+
+    Params:
+      lattice (np.array):    The simulation lattice.
+      neighbors (np.array):  Boolean mask of the sticky sites.
+      blocks (np.array):     Boolean mask of the occupied BLOCKxBLOCK blocks.
+      L (int):               Lattice side length.
+      p (float):             Sticky factor in [0..1].
+      r_spawn (float):       Launch circle radius.
+      r_kill (float):        Kill circle radius, inf to never respawn.
+      ys, xs (np.array):     The walker positions, updated in place.
+      dirs (np.array):       Pre-drawn move numbers, one row per walker.
+      sticks (np.array):     Pre-drawn uniform numbers, one row per walker.
+      stuck (np.array):      Set True for the walkers that stuck.
+    """
+    for w in prange(ys.shape[0]):
+        y, x, _, s = walk(lattice, neighbors, blocks, L, p, r_spawn, r_kill,
+                          ys[w], xs[w], dirs[w], sticks[w], 0)
+        ys[w] = y
+        xs[w] = x
+        stuck[w] = s
+
+
+def shared_arrays(buf: memoryview, L: int) -> tuple:
+    """
+    Map the lattice and the sticky site and occupied block masks onto a
+    shared memory buffer of 2*L*L + nb*nb bytes, nb being the number of
+    blocks per side.
+
+    Params:
+      buf (memoryview):  The shared memory buffer.
+      L (int):           Lattice side length.
+    Returns:
+      (tuple):           The lattice, sticky site and occupied block arrays.
+    """
+    nb = -(-L // BLOCK)
+    lattice = np.ndarray((L, L), dtype=np.int8, buffer=buf)
+    neighbors = np.ndarray((L, L), dtype=bool, buffer=buf, offset=L*L)
+    blocks = np.ndarray((nb, nb), dtype=bool, buffer=buf, offset=2*L*L)
+    return lattice, neighbors, blocks
+
+
+def walk_worker(args: tuple) -> tuple:
+    """
+    Walk a single walker in a worker process. The lattice and the masks are
+    read from shared memory, so only their name is sent to the worker.
+
+    Params:
+      args (tuple):  The shared memory name, the lattice side length, the
+                     sticky factor, the launch and kill radii, the starting
+                     position and the random number generator seed.
+    Returns:
+      (tuple):       The position where the walker stuck.
+    """
+    name, L, p, r_spawn, r_kill, y, x, seed = args
+    shm = SharedMemory(name=name)
+    lattice, neighbors, blocks = shared_arrays(shm.buf, L)
+    rng = np.random.default_rng(seed)
+    stuck = False
+    while not stuck:
+        dirs = rng.integers(N_MOVES, size=WORKER_STEPS, dtype=np.uint8)
+        sticks = rng.random(WORKER_STEPS)
+        y, x, _, stuck = walk(lattice, neighbors, blocks, L, p, r_spawn,
+                              r_kill, y, x, dirs, sticks, 0)
+    del lattice, neighbors, blocks  # Release the buffer before closing
+    shm.close()
+    return y, x
+
+
 class CentralDLA():
     """
-    DLA simulation on central seed. Random walkers spawn on random points at
-    the lattice edges and perform Brownian walk until they hit a neighboring
-    site of previous fixed sites.
+    DLA simulation on central seed. Random walkers spawn on random points of
+    a launch circle just outside the aggregate and perform Brownian walk
+    until they hit a neighboring site of previous fixed sites. Walkers that
+    drift out of the kill circle are moved back to the launch circle. Once
+    the launch circle no longer fits in the lattice, the walkers spawn on
+    free sites of the lattice edges instead.
     """
-    def __init__(self, n_walkers: int, L: int, p: float) -> None:
+    def __init__(self, n_walkers: int, L: int, p: float, seed=None) -> None:
         self.n_walkers = n_walkers                  # Number of random walkers
         self.L = L                                  # Lattice side length
         self.p = p                                  # Sticky factor in [0..1]
-        self.lattice = np.zeros((L, L), dtype=int)  # Simulation lattice
-        self.lattice[L//2, L//2] = 1                # Central seed
-        self.pos = np.zeros(2, dtype=int)           # Current walker position
-        # List the possible moves for random walkers: up, down, left, right
-        self.moves = np.array([[-1, 0], [1, 0], [0, -1], [0, 1]])
+        self.rng = np.random.default_rng(seed)      # Random number generator
+        self.lattice = np.zeros((L, L), dtype=np.int8)  # Occupied sites
+        self.order = np.zeros((L, L), dtype=np.int32)   # Order of fixing
+        self.py = self.px = 0                       # Current walker position
+        # Sticky sites, i.e. free sites adjacent to the fixed ones
+        self.neighbors = np.zeros((L, L), dtype=bool)
+        # Coarse occupancy grid of BLOCKxBLOCK blocks
+        self.blocks = np.zeros((-(-L // BLOCK),)*2, dtype=bool)
+        self.r_max = 0.0                            # Aggregate radius
+        # Coordinates of the sites on the four lattice edges
+        side = np.arange(L)
+        self.edge = (np.concatenate([side, side, np.zeros(L, int),
+                                     np.full(L, L-1)]),
+                     np.concatenate([np.zeros(L, int), np.full(L, L-1),
+                                     side, side]))
+        self.fix(L//2, L//2, 1)                     # Central seed
 
-    def init_walker(self) -> None:
+    def fix(self, y: int, x: int, value: int) -> None:
         """
-        Generate a new random walker on one of the four edges.
+        Fix a walker into the given site, mark the adjacent sites sticky and
+        the containing block occupied.
+
+        Params:
+          y, x (int):   The site coordinates.
+          value (int):  The running number of the walker.
         """
-        self.pos = np.array([np.random.randint(self.L),
-                             np.random.choice([0, self.L-1])])
+        self.lattice[y, x] = 1
+        self.order[y, x] = value
+        self.blocks[y // BLOCK, x // BLOCK] = True
+        if y > 0:
+            self.neighbors[y-1, x] = True
+        if y < self.L-1:
+            self.neighbors[y+1, x] = True
+        if x > 0:
+            self.neighbors[y, x-1] = True
+        if x < self.L-1:
+            self.neighbors[y, x+1] = True
+        r = ((y - self.L//2)**2 + (x - self.L//2)**2)**0.5
+        if r > self.r_max:
+            self.r_max = r
 
-    def pos_valid(self, pos: np.array) -> bool:
+    def launch_radii(self, launch: bool = True) -> tuple:
         """
-        Check if the given position is free and inside the lattice.
+        Compute the radii of the launch and kill circles around the seed.
+        The walkers are released just outside the aggregate instead of the
+        lattice edge, and the ones that drift far away are released again.
+        Once the launch circle no longer fits in the lattice, or if launch
+        is False, the walkers are released from the edges and never killed.
 
         Params:
-          pos (np.array):  The position coordinates.
+          launch (bool):  Use the launch circle if it fits.
         Returns:
-          (boolean):       True if the position is valid, False otherwise.
+          (tuple):        The launch circle radius and the kill circle radius.
         """
-        if (pos[0] >= 0 and pos[1] >= 0 and pos[0] < self.L and pos[1] < self.L
-                and self.lattice[pos[0], pos[1]] == 0):
-            return True
-        return False
+        r_spawn = self.r_max + LAUNCH_GAP
+        if not launch or r_spawn >= self.L//2 - 1:
+            return 0.0, np.inf
+        return r_spawn, KILL_FACTOR*r_spawn
 
-    def move_walker(self) -> None:
+    def init_walker(self, launch: bool = True) -> None:
         """
-        Move walker into one of the allowed neighboring sites.
+        Generate a new random walker on a random point of the launch circle,
+        or on a free site of the four edges if the circle does not fit. The
+        growth might reach the edges, so only the free edge sites are drawn.
+
+        Params:
+          launch (bool):  Use the launch circle if it fits.
         """
-        while True:
-            ind = np.random.randint(4)
-            move = self.moves[ind]     # Random move direction
-            new_pos = self.pos + move  # Trial move
-            if self.pos_valid(new_pos):
-                self.pos = new_pos     # Accept move
-                break
+        r_spawn, _ = self.launch_radii(launch)
+        if r_spawn > 0:
+            angle = 2*np.pi*self.rng.random()
+            self.py = self.L//2 + int(np.rint(r_spawn*np.sin(angle)))
+            self.px = self.L//2 + int(np.rint(r_spawn*np.cos(angle)))
+            return
+        free = np.flatnonzero(self.lattice[self.edge] == 0)
+        if free.size == 0:
+            raise RuntimeError("The aggregate has filled the lattice edges")
+        i = free[self.rng.integers(free.size)]
+        self.py = int(self.edge[0][i])
+        self.px = int(self.edge[1][i])
 
-    def on_sticky_site(self) -> None:
+    def pos_valid(self, y: int, x: int) -> bool:
         """
-        Determine if the walker is on a sticky site. For each adjacent
-        direction in the lattice, check if the adjacent cell value is
-        greater than zero (i.e. is occupied).
+        Check if the given position is free and inside the lattice.
 
+        Params:
+          y, x (int):  The position coordinates.
         Returns:
-          (boolean):  True if on a sticky site, False otherwise.
+          (boolean):   True if the position is valid, False otherwise.
         """
-        inds = self.pos + self.moves
-        inds = inds[(inds[:, 0] > 0) & (inds[:, 0] < self.L)
-                    & (inds[:, 1] > 0) & (inds[:, 1] < self.L)]
-        if (self.lattice[inds[:, 0], inds[:, 1]].sum() > 0):
+        if (y >= 0 and x >= 0 and y < self.L and x < self.L
+                and self.lattice[y, x] == 0):
             return True
         return False
 
-    def run(self) -> None:
+    def run(self, method: str = "serial", jobs: int = 1) -> None:
         """
         Run the simulation main loop.
+
+        Params:
+          method (str):  Main loop implementation: serial, pool, numpy or
+                         numba.
+          jobs (int):    Number of parallel worker processes for pool.
         """
         start = time.time()
 
-        for i in tqdm(range(self.n_walkers)):
+        if method == "pool":
+            self.run_pool(jobs)
+        elif method == "numpy":
+            self.run_numpy()
+        elif method == "numba":
+            self.run_numba()
+        else:
+            self.run_serial()
+
+        print(f"Simulated {self.n_walkers} random walks on a {self.L}x{self.L}"
+              + f" lattice in {time.time() - start:.4f} seconds.")
+
+    def run_serial(self) -> None:
+        """
+        Release the random walkers one at a time.
+        """
+        k = BUFFER_SIZE
+
+        for i in progress(self.n_walkers, iterable=range(self.n_walkers)):
             # Generate new walker
             self.init_walker()
+            y, x = self.py, self.px
 
             # Perform random walk until the walker hits a sticky site
             while True:
-                # Check if the walker is on a sticky site
-                if self.on_sticky_site():
-                    # Fix the walker into the site with a running integer value
-                    self.lattice[self.pos[0], self.pos[1]] = i+1
+                if k == BUFFER_SIZE:
+                    # Refill the random number buffers
+                    dirs = self.rng.integers(N_MOVES, size=BUFFER_SIZE,
+                                             dtype=np.uint8)
+                    sticks = self.rng.random(BUFFER_SIZE)
+                    k = 0
+                y, x, k, stuck = walk(self.lattice, self.neighbors,
+                                      self.blocks, self.L, self.p,
+                                      *self.launch_radii(), y, x, dirs,
+                                      sticks, k)
+                if stuck:
                     break
 
-                # Take a random step
-                self.move_walker()
+            # Fix the walker into the site with a running integer value
+            self.fix(y, x, i+1)
 
+    def run_pool(self, jobs: int) -> None:
+        """
+        Release the random walkers in batches of one walker per worker
+        process. The walkers of a batch walk on a snapshot of the lattice, and
+        the sites they stick to are fixed in order afterwards. A walker whose
+        site was already taken by another walker of the batch is discarded and
+        released again in the next batch. The lattice and the masks are moved
+        into shared memory for the run, so they are not pickled for every
+        task, and only the master process writes to them.
 
-        print(f"Simulated {self.n_walkers} random walks on a {self.L}x{self.L}"
-              + f" lattice in {time.time() - start:.4f} seconds.")
+        Params:
+          jobs (int):  Number of worker processes.
+        """
+        nb = self.blocks.shape[0]
+        shm = SharedMemory(create=True, size=2*self.L*self.L + nb*nb)
+        arrays = shared_arrays(shm.buf, self.L)
+        arrays[0][:] = self.lattice
+        arrays[1][:] = self.neighbors
+        arrays[2][:] = self.blocks
+        self.lattice, self.neighbors, self.blocks = arrays
+        del arrays
+
+        n_fixed = 0
+        pbar = progress(self.n_walkers, total=self.n_walkers)
+        try:
+            with Pool(jobs) as pool, pbar:
+                while n_fixed < self.n_walkers:
+                    tasks = []
+                    for _ in range(min(jobs, self.n_walkers - n_fixed)):
+                        self.init_walker()
+                        tasks.append((shm.name, self.L, self.p,
+                                      *self.launch_radii(), self.py, self.px,
+                                      self.rng.integers(2**32)))
+                    for y, x in pool.map(walk_worker, tasks):
+                        if self.lattice[y, x] == 0:
+                            n_fixed += 1
+                            self.fix(y, x, n_fixed)
+                            pbar.update()
+        finally:
+            # Copy the arrays out of the shared memory before releasing it
+            self.lattice = self.lattice.copy()
+            self.neighbors = self.neighbors.copy()
+            self.blocks = self.blocks.copy()
+            shm.close()
+            shm.unlink()
+
+    def run_numpy(self) -> None:
+        """
+        Move a batch of random walkers in lockstep with NumPy array
+        operations. The walkers only interact through the lattice, so each
+        step they all try to stick, the stuck ones are fixed in order, and
+        the rest step into a random free neighboring site. Stuck walkers,
+        walkers whose site was taken by another walker and walkers out of the
+        kill circle are replaced by new ones. Too many walkers around a small
+        aggregate grow a compact blob instead of DLA, so the batch is kept at
+        WALKER_DENSITY walkers per site of the kill circle, up to BATCH_SIZE.
+        """
+        n = 0
+        ys = np.zeros(n, dtype=int)
+        xs = np.zeros(n, dtype=int)
+        respawn = np.ones(n, dtype=bool)
+        n_fixed = 0
 
-    def plot(self) -> None:
+        with progress(self.n_walkers, total=self.n_walkers) as pbar:
+            while n_fixed < self.n_walkers:
+                # Add walkers as the kill circle grows
+                r_spawn, r_kill = self.launch_radii()
+                area = self.L**2 if r_spawn == 0 else np.pi*r_kill**2
+                size = int(WALKER_DENSITY*min(area, self.L**2))
+                size = max(1, min(size, BATCH_SIZE, self.n_walkers))
+                if size > n:
+                    ys = np.resize(ys, size)
+                    xs = np.resize(xs, size)
+                    respawn = np.append(respawn, np.ones(size - n, bool))
+                    n = size
+
+                # Generate new walkers
+                for w in np.flatnonzero(respawn):
+                    self.init_walker()
+                    ys[w], xs[w] = self.py, self.px
+
+                # Fix the walkers on sticky sites
+                stuck = (self.neighbors[ys, xs]
+                         & (self.rng.random(n) < self.p))
+                for y, x in zip(ys[stuck], xs[stuck]):
+                    if self.lattice[y, x] == 0 and n_fixed < self.n_walkers:
+                        n_fixed += 1
+                        self.fix(y, x, n_fixed)
+                        pbar.update()
+                respawn = self.lattice[ys, xs] != 0
+
+                # Jump far from the aggregate like in walk. The blocks next to
+                # an occupied block are found by shifting the block grid.
+                nb = self.blocks.shape[0]
+                padded = np.pad(self.blocks, 1)
+                near = np.zeros_like(self.blocks)
+                for i in range(3):
+                    for j in range(3):
+                        near |= padded[i:i+nb, j:j+nb]
+                jump = ((ys >= JUMP) & (xs >= JUMP) & (ys < self.L-JUMP)
+                        & (xs < self.L-JUMP) & ~near[ys // BLOCK, xs // BLOCK])
+                angle = 2*np.pi*self.rng.random(n)
+                jy = ys + np.rint(JUMP*np.sin(angle)).astype(int)
+                jx = xs + np.rint(JUMP*np.cos(angle)).astype(int)
+
+                # Step into a random free site, staying put if none is free
+                ny = ys[:, None] + DY
+                nx = xs[:, None] + DX
+                free = ((ny >= 0) & (nx >= 0) & (ny < self.L) & (nx < self.L)
+                        & (self.lattice[np.clip(ny, 0, self.L-1),
+                                        np.clip(nx, 0, self.L-1)] == 0))
+                n_free = free.sum(axis=1)
+                r = self.rng.integers(np.maximum(n_free, 1))
+                d = np.argmax(np.cumsum(free, axis=1) > r[:, None], axis=1)
+                move = n_free > 0
+                ys = np.where(jump, jy,
+                              np.where(move, ny[np.arange(n), d], ys))
+                xs = np.where(jump, jx,
+                              np.where(move, nx[np.arange(n), d], xs))
+
+                # Replace the walkers that drifted out of the kill circle
+                respawn |= ((ys - self.L//2)**2 + (xs - self.L//2)**2
+                            > r_kill**2)
+
+    def run_numba(self) -> None:
+        """
+        Walk one random walker per thread in parallel, up to BATCH_STEPS
+        steps at a time. Between the steps, the stuck walkers are fixed in
+        order and replaced by new ones, like in run_numpy. The walkers see a
+        lattice snapshot that is at most BATCH_STEPS steps old, so only a few
+        walkers are live at a time to keep the growth close to serial DLA.
+        """
+        n = min(get_num_threads(), self.n_walkers)
+        ys = np.zeros(n, dtype=int)
+        xs = np.zeros(n, dtype=int)
+        stuck = np.zeros(n, dtype=bool)
+        respawn = np.ones(n, dtype=bool)
+        n_fixed = 0
+
+        with progress(self.n_walkers, total=self.n_walkers) as pbar:
+            while n_fixed < self.n_walkers:
+                # Generate new walkers
+                for w in np.flatnonzero(respawn):
+                    self.init_walker()
+                    ys[w], xs[w] = self.py, self.px
+
+                # Walk in parallel and fix the stuck walkers
+                dirs = self.rng.integers(N_MOVES, size=(n, BATCH_STEPS),
+                                         dtype=np.uint8)
+                sticks = self.rng.random((n, BATCH_STEPS))
+                walk_batch(self.lattice, self.neighbors, self.blocks, self.L,
+                           self.p, *self.launch_radii(), ys, xs, dirs, sticks,
+                           stuck)
+                for y, x in zip(ys[stuck], xs[stuck]):
+                    if self.lattice[y, x] == 0 and n_fixed < self.n_walkers:
+                        n_fixed += 1
+                        self.fix(y, x, n_fixed)
+                        pbar.update()
+                respawn = self.lattice[ys, xs] != 0
+
+    def gyration_radius(self) -> float:
+        """
+        Compute the radius of gyration of the aggregate.
+
+        Returns:
+          (float):  The radius of gyration of the fixed sites.
+        """
+        return radius_of_gyration(self.lattice)
+
+    def plot(self, out: str = None) -> None:
         """
         Plot the simulation results.
+
+        Params:
+          out (str):  If given, write the lattice into this image file
+                      instead of showing an interactive figure.
         """
+        if out:
+            plt.imsave(out, self.order, cmap='magma')
+            return
         fig, ax = plt.subplots(figsize=(5, 5))
-        ax.imshow(self.lattice, cmap='magma')
+        ax.imshow(self.order, cmap='magma')
         plt.show()
 
 
@@ -119,24 +595,86 @@ class SurfaceDLA(CentralDLA):
     DLA growth on a surface. The random walkers spawn on the top edge.
     The class inherits the CentralDLA class, but re-defines
     """
-    def __init__(self, n_walkers: int, L: int, p=1.0) -> None:
-        CentralDLA.__init__(self, n_walkers, L, p)
-        self.lattice = np.zeros((L, L), dtype=int)  # Re-initialize the lattice
-        self.lattice[L-1, :] = 1  # Surface at the bottom of lattice
+    def __init__(self, n_walkers: int, L: int, p=1.0, seed=None) -> None:
+        CentralDLA.__init__(self, n_walkers, L, p, seed)
+        # Re-initialize the lattice
+        self.lattice[:] = 0
+        self.order[:] = 0
+        self.neighbors[:] = False
+        self.blocks[:] = False
+        self.r_max = 0.0
+        for x in range(L):
+            self.fix(L-1, x, 1)  # Surface at the bottom of lattice
 
-    def init_walker(self) -> None:
+    def gyration_radius(self) -> float:
+        """
+        Compute the radius of gyration of the aggregate, leaving out the
+        surface at the bottom row.
+
+        Returns:
+          (float):  The radius of gyration of the fixed sites.
+        """
+        return radius_of_gyration(self.lattice[:-1])
+
+    def launch_radii(self, launch: bool = True) -> tuple:
+        """
+        The walkers are always released from the top edge and never killed.
+
+        Params:
+          launch (bool):  Ignored, there is no launch circle.
+        Returns:
+          (tuple):        Zero launch radius and infinite kill radius.
+        """
+        return 0.0, np.inf
+
+    def init_walker(self, launch: bool = True) -> None:
         """
         Generate a new random walker on a random point at the top of the
         lattice. The growth might reach the lattice top, so the site must be
         checked.
+
+        Params:
+          launch (bool):  Ignored, there is no launch circle.
         """
-        self.pos[0] = 0
+        self.py = 0
         while True:
-            self.pos[1] = np.random.randint(self.L)
-            if self.pos_valid(self.pos):
+            self.px = int(self.rng.integers(self.L))
+            if self.pos_valid(self.py, self.px):
                 break  # Accept valid position
 
 
+def compare(model: type, n_walkers: int, L: int, p: float, seed: int,
+            jobs: int) -> None:
+    """
+    Run the simulation with every main loop and compare the radii of
+    gyration of the aggregates. A main loop whose walkers stick against a
+    stale lattice grows a too compact aggregate, which shows up as a smaller
+    radius than with the serial main loop.
+
+    Params:
+      model (type):     The simulation class, CentralDLA or SurfaceDLA.
+      n_walkers (int):  Number of random walkers.
+      L (int):          Lattice side length.
+      p (float):        Sticky factor in [0..1].
+      seed (int):       Random number generator seed.
+      jobs (int):       Number of parallel processes for pool.
+    """
+    radii = {}
+    for method in METHODS:
+        dla = model(n_walkers, L, p, seed)
+        dla.run(method, jobs)
+        radii[method] = dla.gyration_radius()
+
+    for method, rg in radii.items():
+        if radii["serial"] > 0:
+            deviation = rg / radii["serial"] - 1
+        else:
+            deviation = 0.0 if rg == 0 else np.inf
+        print(f"{method:>6}: Rg = {rg:.1f} ({deviation:+.1%})"
+              + ("" if abs(deviation) <= RG_TOLERANCE
+                 else ", differs from serial"))
+
+
 def main(argv: list) -> None:
     """
     Simulation main loop.
@@ -151,8 +689,26 @@ def main(argv: list) -> None:
                         help="Lattice side length", type=int)
     parser.add_argument("-p",
                         help="Sticky factor (default 1.0)", type=float)
+    parser.add_argument("-s", "--seed",
+                        help="Random number generator seed", type=int)
+    parser.add_argument("-m", "--method", default="serial",
+                        choices=METHODS,
+                        help="Main loop implementation (default serial)")
+    parser.add_argument("-j", "--jobs", default=1,
+                        help="Number of parallel processes for pool "
+                        + "(default 1)", type=int)
+    parser.add_argument("--no-gui", action="store_true",
+                        help="Write the result into an image file instead "
+                        + "of showing it")
+    parser.add_argument("-o", "--output", default="dla.png",
+                        help="Image file for --no-gui (default dla.png)")
+    parser.add_argument("--compare", action="store_true",
+                        help="Run every main loop and compare the radii of "
+                        + "gyration of the aggregates")
 
     args = parser.parse_args()
+    if args.no_gui:
+        matplotlib.use("Agg")  # Skip the interactive backend
     n_walkers = args.walkers
     L = args.lattice
     if args.p:
@@ -161,15 +717,20 @@ def main(argv: list) -> None:
         p = 1.0
 
     if args.model in ["c", "central"]:
-        dla = CentralDLA(n_walkers, L, p)
+        model = CentralDLA
     elif args.model in ["s", "surface"]:
-        dla = SurfaceDLA(n_walkers, L, p)
+        model = SurfaceDLA
     else:
         parser.print_help()
         sys.exit(1)
 
-    dla.run()
-    dla.plot()
+    if args.compare:
+        compare(model, n_walkers, L, p, args.seed, args.jobs)
+        return
+
+    dla = model(n_walkers, L, p, args.seed)
+    dla.run(args.method, args.jobs)
+    dla.plot(args.output if args.no_gui else None)
 
 
 if __name__ == "__main__":